@@ -4,7 +4,27 @@ Handles tracking crews through different competition stages.
 """
 
 import pandas as pd
-from collections import defaultdict
+import re
+from collections import Counter
+from functools import lru_cache
+
+
+# Veld patterns - order matters, more specific patterns first
+_VELD_RE = re.compile(r'(LVG-B|VG-B|LVE|LVG|LVB|VE|VG|VB|MVG-B|MG-B|MVE|MVG|MVB|ME|MG|MB)')
+
+
+@lru_cache(maxsize=None)
+def _extract_veld_cached(veld_str):
+    """
+    Cached veld classification of an already stripped veld string.
+    The same few veld values recur for every crew in every stage.
+    """
+    if not veld_str or veld_str in ('nan', 'None'):
+        return 'Other'
+    
+    # Look for specific veld patterns - one scan over the compiled alternation
+    match = _VELD_RE.search(veld_str)
+    return match.group(1) if match else veld_str
 
 
 def extract_veld(veld_value):
@@ -20,43 +40,20 @@ def extract_veld(veld_value):
     if pd.isna(veld_value):
         return 'Unknown'
     
-    veld_str = str(veld_value).strip()
+    return _extract_veld_cached(str(veld_value).strip())
+
+
+def extract_veld_series(veld_values):
+    """
+    Apply extract_veld to a whole column of veld values.
     
-    # Look for specific veld patterns - order matters, check more specific patterns first
-    if 'LVG-B' in veld_str:
-        return 'LVG-B'
-    elif 'VG-B' in veld_str:
-        return 'VG-B'
-    elif 'LVE' in veld_str:
-        return 'LVE'
-    elif 'LVG' in veld_str:
-        return 'LVG'
-    elif 'LVB' in veld_str:
-        return 'LVB'
-    elif 'VE' in veld_str:
-        return 'VE'
-    elif 'VG' in veld_str:
-        return 'VG'
-    elif 'VB' in veld_str:
-        return 'VB'
-    elif 'MVG-B' in veld_str:
-        return 'MVG-B'
-    elif 'MG-B' in veld_str:
-        return 'MG-B'
-    elif 'MVE' in veld_str:
-        return 'MVE'
-    elif 'MVG' in veld_str:
-        return 'MVG'
-    elif 'MVB' in veld_str:
-        return 'MVB'
-    elif 'ME' in veld_str:
-        return 'ME'
-    elif 'MG' in veld_str:
-        return 'MG'
-    elif 'MB' in veld_str:
-        return 'MB'
-    else:
-        return veld_str if veld_str not in ['', 'nan', 'None'] else 'Other'
+    Args:
+        veld_values: pandas Series of raw veld values
+        
+    Returns:
+        pd.Series: Standardized veld categories
+    """
+    return veld_values.map(extract_veld)
 
 
 def track_crew_progression_with_slag(all_race_data):
@@ -85,8 +82,6 @@ def track_crew_progression_with_slag(all_race_data):
         for race_name, crew_entries in race_data.items():
             for entry in crew_entries:
                 crew_code = entry.get('code')
-                ploeg_name = entry.get('ploeg')
-                veld_value = entry.get('veld')
                 crew_member = entry.get('crew_member', '')
                 race_sub_number = entry.get('race_sub_number', 'Unknown')
                 
@@ -95,13 +90,13 @@ def track_crew_progression_with_slag(all_race_data):
                 consistent_crew_id = f"{crew_code}_{crew_member.replace(' ', '_')}" if crew_member else crew_code
                 
                 if crew_code and consistent_crew_id:
-                    veld = extract_veld(veld_value)
-                    
-                    if consistent_crew_id not in crew_progression:
-                        crew_progression[consistent_crew_id] = {
+                    progression = crew_progression.get(consistent_crew_id)
+                    if progression is None:
+                        # The first appearance of a crew defines its code, ploeg, veld and crew member
+                        progression = crew_progression[consistent_crew_id] = {
                             'code': crew_code,
-                            'ploeg': ploeg_name,
-                            'veld': veld,
+                            'ploeg': entry.get('ploeg'),
+                            'veld': extract_veld(entry.get('veld')),
                             'crew_member': crew_member,
                             'stages': {}
                         }
@@ -112,7 +107,7 @@ def track_crew_progression_with_slag(all_race_data):
                     else:
                         stage_id = f"{stage_name} {race_sub_number}"
                     
-                    crew_progression[consistent_crew_id]['stages'][stage_name] = stage_id
+                    progression['stages'][stage_name] = stage_id
     
     return crew_progression
 
@@ -128,27 +123,19 @@ def analyze_crew_progression(crew_progressions):
         dict: Analysis results including veld distribution and stage participation
     """
     # Count by veld
-    veld_distribution = defaultdict(int)
-    for crew_id, progression in crew_progressions.items():
-        veld_distribution[progression['veld']] += 1
+    veld_distribution = Counter(progression['veld'] for progression in crew_progressions.values())
     
     # Check progression through stages  
-    stage_participation = defaultdict(int)
-    for crew_id, progression in crew_progressions.items():
-        for stage in progression['stages']:
-            stage_participation[stage] += 1
+    stage_participation = Counter(stage for progression in crew_progressions.values()
+                                  for stage in progression['stages'])
     
     # Find crews that don't make it to finales
-    crews_not_in_finales = []
-    for crew_id, progression in crew_progressions.items():
-        if 'Finales' not in progression['stages']:
-            last_stage = list(progression['stages'].keys())[-1] if progression['stages'] else 'None'
-            crews_not_in_finales.append({
-                'ploeg': progression['ploeg'],
-                'crew_member': progression['crew_member'],
-                'veld': progression['veld'],
-                'last_stage': last_stage
-            })
+    crews_not_in_finales = [{
+        'ploeg': progression['ploeg'],
+        'crew_member': progression['crew_member'],
+        'veld': progression['veld'],
+        'last_stage': next(reversed(progression['stages']), 'None')
+    } for progression in crew_progressions.values() if 'Finales' not in progression['stages']]
     
     return {
         'total_crews': len(crew_progressions),
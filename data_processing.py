@@ -3,7 +3,65 @@ Data processing functions for rowing competition analysis.
 Handles Excel import and race data extraction with slag information.
 """
 
+import numpy as np
+import os
 import pandas as pd
+import re
+from functools import lru_cache
+
+
+# Race name patterns, e.g. 'za 10:20 - race 117 - [303] VSc 2x voorwedstrijd 1'
+_RACE_NUMBER_RE = re.compile(r'race\s*(\d+)', re.IGNORECASE)
+_RACE_SUB_NUMBER_RES = {
+    'voorwedstrijden': re.compile(r'voorwedstrijd\s+(\d+)', re.IGNORECASE),
+    'challenges': re.compile(r'challenge\s+(\d+)', re.IGNORECASE),
+    'halve finales': re.compile(r'finale\s+(\d+)', re.IGNORECASE),
+    'finales': re.compile(r'(\S+)\s*-finale', re.IGNORECASE)
+}
+
+# Standard headers of the sheet columns that are kept, and the final column order
+_COLUMN_HEADERS = {0: 'pos.', 1: 'code', 2: 'ploeg', 3: 'veld', 4: 'baan', 5: 'next_round'}
+_RACE_COLUMNS = ['pos.', 'code', 'ploeg', 'veld', 'baan', 'next_round',
+                 'race_name', 'race_number', 'race_sub_number', 'race_type',
+                 'crew_member', 'crew_unique_id']
+
+
+def _scan_crew_rows(race_rows, slag_idx, digit_idx, race_hdr_idx, n_rows):
+    """
+    Locate the crew rows of a set of races in one vectorized pass.
+    
+    The crews of a race are the position rows after its slag header, up to
+    the next race header and at most 50 rows after the race header. A race
+    without a slag header before the next race has no crews.
+    
+    Args:
+        race_rows: Row indices of the race headers
+        slag_idx: Sorted row indices of the slag header rows
+        digit_idx: Sorted row indices of the rows with a position number
+        race_hdr_idx: Sorted row indices of all race header rows
+        n_rows: Number of rows in the sheet
+        
+    Returns:
+        tuple: Arrays (race, row, crew_counter) with one element per crew,
+        where race indexes into race_rows
+    """
+    # Each race ends at the next race header, or at most 50 rows after its own header
+    next_race = np.append(race_hdr_idx, n_rows)[np.searchsorted(race_hdr_idx, race_rows + 1)]
+    window_end = np.minimum(race_rows + 50, next_race)
+    
+    # First slag header after each race header, within the window
+    slag_rows = np.append(slag_idx, n_rows)[np.searchsorted(slag_idx, race_rows + 1)]
+    crew_start = slag_rows + 1
+    crew_end = np.where(slag_rows < window_end, window_end, crew_start)
+    
+    # Crew data rows are the ones with a position number
+    lo = np.searchsorted(digit_idx, crew_start)
+    counts = np.searchsorted(digit_idx, crew_end) - lo
+    race = np.repeat(np.arange(len(race_rows)), counts)
+    crew_offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    crew_rows = digit_idx[np.repeat(lo, counts) + crew_offset]
+    
+    return race, crew_rows, crew_offset + 1
 
 
 def process_race_data_with_slag(df):
@@ -20,153 +78,143 @@ def process_race_data_with_slag(df):
         dict: Dictionary containing processed DataFrames for each race type
     """
     
-    # Helper function to identify race type
-    def get_race_type(race_name):
-        if pd.isna(race_name) or not isinstance(race_name, str):
-            return None
-        race_name_lower = race_name.lower()
-        if 'voorwedstrijd' in race_name_lower:
-            return 'voorwedstrijden'
-        elif 'challenge' in race_name_lower:
-            return 'challenges'
-        elif 'halve' in race_name_lower and 'finale' in race_name_lower:
-            return 'halve finales'
-        elif 'finale' in race_name_lower:
-            return 'finales'
-        else:
-            return 'other'
-    
     # Helper function to extract race number
     def extract_race_numbers(race_name, race_type):
-        race_number = None
-        race_sub_number = None
+        race_number_match = _RACE_NUMBER_RE.search(race_name)
+        race_number = int(race_number_match.group(1)) if race_number_match else None
         
-        if 'race' in race_name.lower():
-            try:
-                race_number = int(race_name.split('race')[1].split('-')[0].strip())
-            except:
-                pass
-        
-        try:
-            if race_type == 'voorwedstrijden' and 'voorwedstrijd' in race_name.lower():
-                race_sub_number = int(race_name.split('voorwedstrijd')[1].strip().split()[0])
-            elif race_type == 'challenges' and 'challenge' in race_name.lower():
-                race_sub_number = int(race_name.split('challenge')[1].strip().split()[0])
-            elif race_type == 'halve finales' and 'finale' in race_name.lower():
-                race_sub_number = int(race_name.split('finale')[1].strip().split()[0])
-            elif race_type == 'finales' and 'finale' in race_name.lower():
-                if '-finale' in race_name.lower():
-                    race_sub_number = race_name.split('-finale')[0].split()[-1]
-        except:
-            pass
+        # Finales are numbered by letter, the other stages by integer
+        race_sub_number = None
+        sub_number_re = _RACE_SUB_NUMBER_RES.get(race_type)
+        sub_number_match = sub_number_re.search(race_name) if sub_number_re else None
+        if sub_number_match:
+            race_sub_number = sub_number_match.group(1)
+            if race_type != 'finales':
+                race_sub_number = int(race_sub_number)
             
         return race_number, race_sub_number
     
-    # Add race type column
-    df['race_type'] = df.iloc[:, 0].apply(get_race_type)
+    # Row masks over the whole sheet: 'slag' rows, crew rows (digit in the first column)
+    # and crew rows followed by a crew member row
+    n_rows = len(df)
+    values = df.to_numpy(dtype=object)
+    first_col = df.iloc[:, 0]
+    is_slag = df.apply(lambda c: c.astype(str).str.strip().str.lower().eq('slag'), axis=0).any(axis=1).to_numpy()
+    is_digit = first_col.astype('string').str.strip().str.fullmatch(r'\d+', na=False).to_numpy(dtype=bool)
+    
+    # The crew member name appears in the 'ploeg' column (index 2) of the row after each crew
+    ploeg_col = df.iloc[:, 2]
+    next_ploeg = ploeg_col.astype(str).str.strip().shift(-1).to_numpy()
+    has_member = np.zeros(n_rows, dtype=bool)
+    has_member[:-1] = ploeg_col.notna().to_numpy()[1:] & ~is_digit[1:]
+    
+    # Add race type column - order matters, halve finales before finales
+    race_name_lower = first_col.astype('string').str.lower()
+    is_voorwedstrijd = race_name_lower.str.contains('voorwedstrijd', na=False)
+    is_challenge = race_name_lower.str.contains('challenge', na=False)
+    is_finale = race_name_lower.str.contains('finale', na=False)
+    is_halve_finale = race_name_lower.str.contains('halve', na=False) & is_finale
+    df['race_type'] = np.select([is_voorwedstrijd, is_challenge, is_halve_finale, is_finale],
+                                ['voorwedstrijden', 'challenges', 'halve finales', 'finales'], default=None)
+    
+    slag_idx = np.flatnonzero(is_slag)
+    digit_idx = np.flatnonzero(is_digit)
+    race_type_values = df['race_type'].to_numpy()
+    
+    # A race type header, or any other row mentioning a race, stops the crews of the previous race
+    is_race_hdr = pd.notna(race_type_values) | race_name_lower.str.contains('race', na=False).to_numpy(dtype=bool)
+    race_hdr_idx = np.flatnonzero(is_race_hdr)
     
     # Process each race type
     race_types = ['voorwedstrijden', 'challenges', 'halve finales', 'finales']
     datasets = {}
     
     for race_type in race_types:
-        race_data_list = []
-        race_rows = df[df['race_type'] == race_type].index.tolist()
+        race_rows = np.flatnonzero(race_type_values == race_type)
+        race_names = values[race_rows, 0]
+        race_numbers = [extract_race_numbers(race_name, race_type) for race_name in race_names]
         
-        for race_idx in race_rows:
-            race_name = df.iloc[race_idx, 0]
-            race_number, race_sub_number = extract_race_numbers(race_name, race_type)
-            
-            # Look for the slag header and then process crew data
-            slag_found = False
-            crew_counter = 0
-            
-            for i in range(race_idx + 1, min(race_idx + 50, len(df))):
-                if i >= len(df):
-                    break
-                    
-                current_row = df.iloc[i]
-                
-                # Check for slag header
-                if not slag_found:
-                    for val in current_row.values:
-                        if pd.notna(val) and str(val).strip().lower() == 'slag':
-                            slag_found = True
-                            break
-                    continue
-                
-                # After finding slag, look for crew data
-                if slag_found:
-                    first_col = str(current_row.iloc[0]).strip()
-                    
-                    # Stop if we hit the next race
-                    if pd.notna(current_row.iloc[0]) and any(x in str(current_row.iloc[0]).lower() 
-                                                            for x in ['race', 'voorwedstrijd', 'challenge', 'finale']):
-                        break
-                    
-                    # Check if this is a crew data row (has position number)
-                    if first_col.isdigit():
-                        crew_counter += 1
-                        crew_row = current_row.copy()
-                        
-                        # Get crew member name from next row if available
-                        crew_member_name = ""
-                        if i + 1 < len(df):
-                            next_row = df.iloc[i + 1]
-                            # The crew member name appears in the 'ploeg' column (index 2) of the next row
-                            if pd.notna(next_row.iloc[2]) and not str(next_row.iloc[0]).strip().isdigit():
-                                crew_member_name = str(next_row.iloc[2]).strip()
-                        
-                        # Add metadata
-                        crew_row['race_name'] = race_name
-                        crew_row['race_number'] = race_number
-                        crew_row['race_sub_number'] = race_sub_number
-                        crew_row['race_type'] = race_type
-                        crew_row['crew_member'] = crew_member_name
-                        crew_row['crew_unique_id'] = f"{crew_row.iloc[1]}_{race_sub_number}_{crew_counter}"  # code_race_position
-                        
-                        race_data_list.append(crew_row)
+        # Look for the slag header and then process crew data of all races at once
+        race, crew_rows, crew_counter = _scan_crew_rows(race_rows, slag_idx, digit_idx, race_hdr_idx, n_rows)
         
         # Create dataframe with proper headers
-        if race_data_list:
-            race_df = pd.DataFrame(race_data_list)
-            # Apply standard headers (excluding time columns col_5 to col_12)
-            headers = ['pos.', 'code', 'ploeg', 'veld', 'baan', 'next_round']
-            column_mapping = {}
-            for i, header in enumerate(headers):
-                if i in race_df.columns:
-                    column_mapping[i] = header
-            for col in ['race_name', 'race_number', 'race_sub_number', 'race_type', 'crew_member', 'crew_unique_id']:
-                if col in race_df.columns:
-                    column_mapping[col] = col
-            race_df = race_df.rename(columns=column_mapping)
+        if len(crew_rows):
+            race_number = [race_numbers[r][0] for r in race]
+            race_sub_number = [race_numbers[r][1] for r in race]
             
-            # Keep only the relevant columns (remove time columns)
-            columns_to_keep = ['pos.', 'code', 'ploeg', 'veld', 'baan', 'next_round', 
-                             'race_name', 'race_number', 'race_sub_number', 'race_type', 
-                             'crew_member', 'crew_unique_id']
-            race_df = race_df[[col for col in columns_to_keep if col in race_df.columns]]
-            datasets[race_type] = race_df
+            # Apply standard headers to the kept sheet columns (remove time columns)
+            columns = {_COLUMN_HEADERS[j]: values[crew_rows, j].tolist() for j in range(min(6, values.shape[1]))}
+            
+            # Add metadata
+            columns['race_name'] = race_names[race].tolist()
+            columns['race_number'] = race_number
+            columns['race_sub_number'] = race_sub_number
+            columns['race_type'] = race_type
+            columns['crew_member'] = np.where(has_member[crew_rows], next_ploeg[crew_rows], "").tolist()
+            columns['crew_unique_id'] = [f"{code}_{sub_number}_{counter}"  # code_race_position
+                                         for code, sub_number, counter in zip(values[crew_rows, 1], race_sub_number, crew_counter)]
+            
+            # Build the frame in one go, in the final column order
+            datasets[race_type] = pd.DataFrame(columns, index=crew_rows, columns=_RACE_COLUMNS)
         else:
             datasets[race_type] = pd.DataFrame()
     
     return datasets
 
 
+@lru_cache(maxsize=8)
+def _load_and_process_excel_cached(file_path, mtime_ns, size):
+    """
+    Cached load_and_process_excel for a local file path. The modification time
+    and size are part of the key, so an edited file is parsed again. The
+    returned datasets are shared between calls and must not be modified.
+    """
+    return _load_and_process_excel(file_path)
+
+
+def _load_and_process_excel(file_path):
+    """
+    Load Excel file and process race data, without caching.
+    """
+    # Import the Excel file without header assumption. All columns are read,
+    # the slag header is not guaranteed to be in the first six
+    read_options = dict(header=None, dtype=object)
+    try:
+        # python-calamine (Rust-backed) parses xlsx much faster than openpyxl
+        df = pd.read_excel(file_path, engine='calamine', **read_options)
+    except (ImportError, ValueError):
+        # calamine is not installed, not supported by this pandas, or failed on the file
+        if hasattr(file_path, 'seek'):
+            file_path.seek(0)
+        df = pd.read_excel(file_path, engine='openpyxl', **read_options)
+    
+    # Process the data
+    datasets = process_race_data_with_slag(df)
+    
+    return datasets
+
+
 def load_and_process_excel(file_path):
     """
     Load Excel file and process race data.
     
+    Results for a local file are cached until the file changes, so reloading
+    the same workbook skips the Excel import. Each call gets its own copies
+    of the DataFrames. URLs, fsspec paths and file objects are always read.
+    
     Args:
         file_path: Path to the Excel file
         
     Returns:
         dict: Processed datasets by race type
     """
-    # Import the Excel file without header assumption
-    df = pd.read_excel(file_path, header=None)
+    if not isinstance(file_path, (str, os.PathLike)) or not os.path.isfile(file_path):
+        return _load_and_process_excel(file_path)
     
-    # Process the data
-    datasets = process_race_data_with_slag(df)
+    # One cache entry per file, however the path is spelled
+    real_path = os.path.realpath(file_path)
+    stat = os.stat(real_path)
+    datasets = _load_and_process_excel_cached(real_path, stat.st_mtime_ns, stat.st_size)
     
-    return datasets
+    # The cached DataFrames are shared, callers only ever see copies
+    return {race_type: race_df.copy() for race_type, race_df in datasets.items()}
@@ -4,105 +4,78 @@ Creates interactive flow diagrams showing crew progression through stages.
 """
 
 import plotly.graph_objects as go
+import numpy as np
 import pandas as pd
 from collections import defaultdict
 import re
 
 
-def detect_competition_format(all_race_data):
+# Finale race names, e.g. 'B-finale' and 'halve-ABC-finale'
+_FINALE_RE = re.compile(r'([A-G])-finale', re.IGNORECASE)
+_HALVE_RE = re.compile(r'halve-([A-G]+)-finale', re.IGNORECASE)
+
+# Boat class within a veld name, e.g. 'VG 2x' or 'LMB 4-'
+_BOAT_CLASS_RE = re.compile('|'.join(map(re.escape, ['2x', '4-', '4+', '8+'])))
+
+# Naming convention of a veld name, e.g. 'LVG-B 2x' → ('L', 'V', 'G')
+_PREFIX_RE = re.compile(r'(L?)([VM])([EGB])')
+
+
+def detect_competition_format(all_race_data, verbose=False):
     """
-    Automatically detect the competition format     print(f"Found {len([n for n in node_counts if n.startswith('Veld')])} veld categories")
-      print(f"Column 4 (Eindklassering) - first 10:")
-    for node in col4_nodes[:10]:
-        pos = col4_positions[node]
-        count = node_counts[node]
-        position_num = get_position_number(node)
-        veld = node.split('(')[1].split(')')[0] if '(' in node else "Unknown"
-        print(f"  {node:<30} y={pos['y']:.3f} (pos: {position_num}) [{veld}]")
-    if len(col4_nodes) > 10:
-        print(f"  ... and {len(col4_nodes)-10} more positions")"Found {len([n for n in node_counts if '_' in n and not n.startswith('Eindklassering')])} detailed halve finale nodes")
-    print(f"Found {len([n for n in node_counts if n.startswith('Finale')])} individual finales")
-    print(f"Found {len([n for n in node_counts if n.startswith('Eindklassering')])} final positions")d on the data
+    Automatically detect the competition format based on the data
     Returns configuration for field types, finale groups, and colors
+    The detected configuration is only printed when verbose is True
     """
-    print("Detecting competition format...")
+    if verbose:
+        print("Detecting competition format...")
     
     # Collect all unique veld categories from the data
     veld_categories = set()
     finale_letters = set()
     halve_finale_groups = set()
+    race_finale_letters = {}
     
     # Extract veld categories from all race types
     for race_type, races in all_race_data.items():
         for race_name, crew_entries in races.items():
-            for entry in crew_entries:
-                veld = entry.get('veld', '')
-                if veld and veld != 'Unknown':
-                    veld_categories.add(veld)
+            veld_categories.update(entry.get('veld', '') for entry in crew_entries)
             
             # Extract finale information
             if 'finale' in race_name.lower():
                 # Extract finale letter (A, B, C, D, E, F, G, etc.)
-                finale_match = re.search(r'([A-G])-finale', race_name, re.IGNORECASE)
+                finale_match = _FINALE_RE.search(race_name)
                 if finale_match:
-                    finale_letters.add(finale_match.group(1).upper())
+                    race_finale_letters[race_name] = finale_match.group(1).upper()
+                    finale_letters.add(race_finale_letters[race_name])
                 
                 # Extract halve finale groups (ABC, DEFG, DE, etc.)
-                halve_match = re.search(r'halve-([A-G]+)-finale', race_name, re.IGNORECASE)
+                halve_match = _HALVE_RE.search(race_name)
                 if halve_match:
                     halve_finale_groups.add(halve_match.group(1).upper())
     
+    # Drop missing and unknown velds
+    veld_categories = {veld for veld in veld_categories if veld and veld != 'Unknown'}
+    
     # Sort veld categories intelligently
     veld_list = sorted(list(veld_categories))
     
     # Detect boat class (2x, 4-, etc.)
     boat_classes = set()
     for veld in veld_list:
-        if '2x' in veld:
-            boat_classes.add('2x')
-        elif '4-' in veld:
-            boat_classes.add('4-')
-        elif '4+' in veld:
-            boat_classes.add('4+')
-        elif '8+' in veld:
-            boat_classes.add('8+')
+        boat_class_match = _BOAT_CLASS_RE.search(veld)
+        if boat_class_match:
+            boat_classes.add(boat_class_match.group(0))
     
     # Detect naming convention (VE vs ME, LVG vs LMG, etc.)
     prefix_patterns = {}
     for veld in veld_list:
-        # Check main prefix patterns (E, G, G-B, B)
-        if 'E' in veld and not veld.startswith('L'):
-            if veld.startswith('VE'):
-                prefix_patterns['E'] = 'V'
-            elif veld.startswith('ME'):
-                prefix_patterns['E'] = 'M'
-        if 'G' in veld and not veld.startswith('L'):
-            if veld.startswith('VG'):
-                prefix_patterns['G'] = 'V'
-            elif veld.startswith('MG'):
-                prefix_patterns['G'] = 'M'
-        if 'B' in veld and not veld.startswith('L') and 'G-B' not in veld:
-            if veld.startswith('VB'):
-                prefix_patterns['B'] = 'V'
-            elif veld.startswith('MB'):
-                prefix_patterns['B'] = 'M'
-        
-        # Check L prefix patterns (LE, LG, LG-B, LB)
-        if 'LVE' in veld or 'LME' in veld:
-            if 'LVE' in veld:
-                prefix_patterns['LE'] = 'LV'
-            elif 'LME' in veld:
-                prefix_patterns['LE'] = 'LM'
-        if 'LVG' in veld or 'LMG' in veld:
-            if 'LVG' in veld:
-                prefix_patterns['LG'] = 'LV'
-            elif 'LMG' in veld:
-                prefix_patterns['LG'] = 'LM'
-        if 'LVB' in veld or 'LMB' in veld:
-            if 'LVB' in veld:
-                prefix_patterns['LB'] = 'LV'
-            elif 'LMB' in veld:
-                prefix_patterns['LB'] = 'LM'
+        # Main (E, G, G-B, B) and L (LE, LG, LG-B, LB) prefix patterns in one match,
+        # G-B fields count as G
+        prefix_match = _PREFIX_RE.match(veld)
+        if prefix_match:
+            light, prefix, category = prefix_match.groups()
+            prefix_patterns[light + category] = light + prefix
     
     # Determine veld ordering based on detected patterns
     boat_class = list(boat_classes)[0] if boat_classes else '2x'
@@ -145,20 +118,26 @@ def detect_competition_format(all_race_data):
         else:
             halve_groups = ['ABC', 'DEFG']
     
+    # Finale letter → halve finale group lookup
+    letter_to_group = _build_letter_to_group(halve_groups)
+    
     config = {
         'veld_order': veld_order,
         'boat_class': boat_class,
         'finale_letters': finale_list,
         'halve_finale_groups': halve_groups,
-        'prefix_patterns': prefix_patterns
+        'prefix_patterns': prefix_patterns,
+        'race_finale_letters': race_finale_letters,
+        'letter_to_group': letter_to_group
     }
     
-    print(f"Detected configuration:")
-    print(f"  - Boat class: {boat_class}")
-    print(f"  - Veld categories: {len(veld_order)} found")
-    print(f"  - Finale letters: {finale_list}")
-    print(f"  - Halve finale groups: {halve_groups}")
-    print(f"  - Prefix patterns: {prefix_patterns}")
+    if verbose:
+        print(f"Detected configuration:")
+        print(f"  - Boat class: {boat_class}")
+        print(f"  - Veld categories: {len(veld_order)} found")
+        print(f"  - Finale letters: {finale_list}")
+        print(f"  - Halve finale groups: {halve_groups}")
+        print(f"  - Prefix patterns: {prefix_patterns}")
     
     return config
 
@@ -188,29 +167,18 @@ def get_adaptive_colors(config):
     le_prefix = prefix_patterns.get('LE', 'LV')
     lb_prefix = prefix_patterns.get('LB', 'LV')
     
-    veld_colors = {}
-    for veld in config['veld_order']:
-        # Use exact matching to prevent substring conflicts
-        # Check for L fields first (more specific patterns) with exact matching
-        if veld == f'{le_prefix}E {boat_class}':
-            veld_colors[veld] = colors['red_dark']
-        elif veld == f'{l_prefix}G-B {boat_class}':  # Check LG-B before LG
-            veld_colors[veld] = colors['hot_pink']  # Hot Pink for L G-B fields (very distinct)
-        elif veld == f'{l_prefix}G {boat_class}':
-            veld_colors[veld] = colors['green_bright']
-        elif veld == f'{lb_prefix}B {boat_class}':
-            veld_colors[veld] = colors['brown']
-        # Then check for main fields with exact matching
-        elif veld == f'{main_prefix}E {boat_class}':
-            veld_colors[veld] = colors['red_bright']
-        elif veld == f'{main_prefix}G-B {boat_class}':  # Check MG-B before MG
-            veld_colors[veld] = colors['orange_bright']  # Bright Orange for main G-B fields (very distinct from hot pink)
-        elif veld == f'{main_prefix}G {boat_class}':
-            veld_colors[veld] = colors['blue_bright']
-        elif veld == f'{main_prefix}B {boat_class}':
-            veld_colors[veld] = colors['gray']
-        else:
-            veld_colors[veld] = colors['gray']
+    # Color of each expected veld name - exact names, so 'LVG 2x', 'VG 2x' and 'VG-B 2x' each get their own color
+    veld_palette = {
+        f'{le_prefix}E {boat_class}': colors['red_dark'],
+        f'{l_prefix}G-B {boat_class}': colors['hot_pink'],  # Hot Pink for L G-B fields (very distinct)
+        f'{l_prefix}G {boat_class}': colors['green_bright'],
+        f'{lb_prefix}B {boat_class}': colors['brown'],
+        f'{main_prefix}E {boat_class}': colors['red_bright'],
+        f'{main_prefix}G-B {boat_class}': colors['orange_bright'],  # Bright Orange for main G-B fields (very distinct from hot pink)
+        f'{main_prefix}G {boat_class}': colors['blue_bright'],
+        f'{main_prefix}B {boat_class}': colors['gray']
+    }
+    veld_colors = {veld: veld_palette.get(veld, colors['gray']) for veld in config['veld_order']}
     
     return veld_colors
 
@@ -237,60 +205,79 @@ def create_adaptive_halve_finale_groups(race_name, config):
         return 'OTHER'
 
 
-def get_finale_group_from_letter(finale_letter, config):
+def _build_letter_to_group(halve_finale_groups):
     """
-    Determine which halve finale group a finale letter belongs to
+    Map each finale letter to the halve finale group it belongs to
     """
-    finale_letter = finale_letter.upper()
+    letter_to_group = {}
     
     # Standard groupings based on detected halve finale groups
-    if 'ABC' in config['halve_finale_groups']:
-        if finale_letter in ['A', 'B', 'C']:
-            return 'ABC'
+    for group in ['ABC', 'DEFG', 'DE']:
+        if group in halve_finale_groups:
+            for finale_letter in group:
+                letter_to_group.setdefault(finale_letter, group)
     
-    if 'DEFG' in config['halve_finale_groups']:
-        if finale_letter in ['D', 'E', 'F', 'G']:
-            return 'DEFG'
+    # Fallback for other letters
+    for group in ['ABC', 'DE', 'FG']:
+        for finale_letter in group:
+            letter_to_group.setdefault(finale_letter, group)
     
-    if 'DE' in config['halve_finale_groups']:
-        if finale_letter in ['D', 'E']:
-            return 'DE'
+    return letter_to_group
+
+
+def get_finale_group_from_letter(finale_letter, config):
+    """
+    Determine which halve finale group a finale letter belongs to
+    """
+    letter_to_group = config.get('letter_to_group')
+    if letter_to_group is None:
+        letter_to_group = _build_letter_to_group(config['halve_finale_groups'])
     
-    # Fallback for other letters
-    if finale_letter in ['A', 'B', 'C']:
-        return 'ABC'
-    elif finale_letter in ['D', 'E']:
-        return 'DE'
-    elif finale_letter in ['F', 'G']:
-        return 'FG'
-    else:
-        return 'OTHER'
+    return letter_to_group.get(finale_letter.upper(), 'OTHER')
 
 
 # Create 4-column cumulative positioning function (veld → halve finale groups → individual finales → final positions)
-def create_four_column_cumulative_sankey(all_race_data):
+def create_four_column_cumulative_sankey(all_race_data, verbose=False):
     """
     Adaptive 4-Column Sankey: Veld Categories → Detailed Halve Finale Nodes → Individual Finales → Final Positions
     Automatically detects competition format and adapts to different boat classes and naming conventions
+    Diagnostic output is only printed when verbose is True
     """
-    import plotly.graph_objects as go
-    from collections import defaultdict
+    if verbose:
+        print("Creating adaptive 4-column cumulative Sankey...")
     
-    print("Creating adaptive 4-column cumulative Sankey...")
+    # Nothing to draw without halve finales or finales
+    if not all_race_data.get('halve finales') and not all_race_data.get('finales'):
+        return go.Figure()
     
     # Step 0: Detect competition format
-    config = detect_competition_format(all_race_data)
+    config = detect_competition_format(all_race_data, verbose)
     veld_colors = get_adaptive_colors(config)
     
-    # Step 1: Collect flows and counts for all four columns
-    flows = []
-    node_counts = defaultdict(int)
+    # Create adaptive color mapping for links - hex colors converted to rgba
+    veld_link_colors = {}
+    for veld, color_hex in veld_colors.items():
+        rgb = tuple(int(color_hex[i:i+2], 16) for i in (1, 3, 5))
+        veld_link_colors[veld] = f'rgba({rgb[0]}, {rgb[1]}, {rgb[2]}, 0.6)'
+    
+    # Step 1: Aggregate the flows of each stage into its own dict, recording the veld of
+    # every veld, halve finale and position node as the node is created
+    # (finale nodes have mixed inflows/outflows and no veld of their own)
+    halve_flows = defaultdict(int)
+    finale_flows = defaultdict(int)
+    position_flows = defaultdict(int)
+    node_velds = {}
+    position_numbers = {}
     
     # Process halve finales data for column 1 → column 2 (unlabeled halve finale nodes)
     if 'halve finales' in all_race_data:
-        print("Processing halve finales data (veld → unlabeled halve finale nodes):")
+        if verbose:
+            print("Processing halve finales data (veld → unlabeled halve finale nodes):")
         for race_name, crew_entries in all_race_data['halve finales'].items():
-            print(f"  Processing: {race_name} ({len(crew_entries)} crews)")
+            if not crew_entries:
+                continue
+            if verbose:
+                print(f"  Processing: {race_name} ({len(crew_entries)} crews)")
             
             # Determine halve finale group adaptively
             halve_group = create_adaptive_halve_finale_groups(race_name, config)
@@ -298,99 +285,85 @@ def create_four_column_cumulative_sankey(all_race_data):
             for entry in crew_entries:
                 veld = entry.get('veld', 'Unknown')
                 if veld and veld != 'Unknown':
+                    veld = str(veld)
                     source = f"Veld {veld}"
                     target = f"{halve_group}_{veld}"  # Internal identifier, will be empty in labels
-                    
-                    flows.append((source, target, 1))
-                    node_counts[source] += 1
-                    node_counts[target] += 1
-    
-    # Process finales data for column 2 → column 3 (detailed halve finale nodes → individual finales)
+                    halve_flows[(source, target)] += 1
+                    node_velds[source] = node_velds[target] = veld
+    
+    # Finale letter → (finale node, halve finale group, position offset), based on detected finale structure
+    finale_meta = {}
+    for i, finale_letter in enumerate(sorted(config['finale_letters'])):
+        finale_meta[finale_letter] = (f"Finale {finale_letter}",
+                                      get_finale_group_from_letter(finale_letter, config),
+                                      6 * i)  # Standard 6 positions per finale
+    
+    # Process finales data for column 2 → column 3 → column 4 in a single pass
+    # (detailed halve finale nodes → individual finales → final positions with field tracking)
     if 'finales' in all_race_data:
-        print("\nProcessing finales data (detailed halve finale nodes → individual finales):")
-        for race_name, crew_entries in all_race_data['finales'].items():
-            print(f"  Processing: {race_name} ({len(crew_entries)} crews)")
-            
-            # Extract finale letter adaptively
-            finale_match = re.search(r'([A-G])-finale', race_name, re.IGNORECASE)
-            if not finale_match:
-                continue
-                
-            finale_letter = finale_match.group(1).upper()
-            target = f"Finale {finale_letter}"
-            
-            # Determine which halve finale group this finale belongs to
-            finale_group = get_finale_group_from_letter(finale_letter, config)
-            
-            # Create flows from each veld's detailed halve finale node to this finale
-            # Group crews by veld to create proper flows
-            veld_counts = defaultdict(int)
-            for entry in crew_entries:
-                veld = entry.get('veld', 'Unknown')
-                if veld and veld != 'Unknown':
-                    veld_counts[veld] += 1
-            
-            # Create flows from detailed halve finale nodes
-            for veld, count in veld_counts.items():
-                source = f"{finale_group}_{veld}"
-                flows.append((source, target, count))
-                node_counts[source] += count
-                node_counts[target] += count
-    
-    # Process finales data for column 3 → column 4 (individual finales → final positions with field tracking)
-    if 'finales' in all_race_data:
-        print("\nProcessing finales positions (individual finales → final positions with field tracking):")
+        if verbose:
+            print("\nProcessing finales data (detailed halve finale nodes → individual finales → final positions):")
         
-        # Calculate position offsets based on detected finale structure
-        finale_position_offsets = {}
-        position_offset = 0
-        for finale_letter in sorted(config['finale_letters']):
-            finale_position_offsets[finale_letter] = position_offset
-            position_offset += 6  # Standard 6 positions per finale
+        # Sort crew entries by position within a finale
+        def get_position(entry):
+            pos = str(entry.get('pos', '') or entry.get('pos.', ''))
+            return int(pos) if pos.isdecimal() else 999  # Put invalid positions at the end
         
         for race_name, crew_entries in all_race_data['finales'].items():
-            print(f"  Processing positions for: {race_name} ({len(crew_entries)} crews)")
-            
-            # Extract finale letter
-            finale_match = re.search(r'([A-G])-finale', race_name, re.IGNORECASE)
-            if not finale_match:
+            if not crew_entries:
                 continue
-                
-            finale_letter = finale_match.group(1).upper()
-            source = f"Finale {finale_letter}"
-            position_offset = finale_position_offsets.get(finale_letter, 0)
-            
-            # Sort crew entries by position within this finale
-            def get_position(entry):
-                pos = entry.get('pos', '') or entry.get('pos.', '')
-                if isinstance(pos, int):
-                    return pos
-                elif isinstance(pos, str) and pos.isdigit():
-                    return int(pos)
-                else:
-                    return 999  # Put invalid positions at the end
+            if verbose:
+                print(f"  Processing: {race_name} ({len(crew_entries)} crews)")
             
-            sorted_entries = sorted(crew_entries, key=get_position)
+            # Finale letter of the race, found during format detection
+            finale_letter = config['race_finale_letters'].get(race_name)
+            if finale_letter is None:
+                continue
+            finale_node, finale_group, position_offset = finale_meta[finale_letter]
             
-            # Create flows from finale to final positions with field tracking
-            for i, entry in enumerate(sorted_entries):
+            # Create flows from each veld's detailed halve finale node to this finale,
+            # and from this finale to the final positions; crews without a veld still take up a position
+            for i, entry in enumerate(sorted(crew_entries, key=get_position)):
                 veld = entry.get('veld', 'Unknown')
                 if veld and veld != 'Unknown':
+                    veld = str(veld)
                     final_position = position_offset + i + 1
+                    source = f"{finale_group}_{veld}"
                     target = f"Eindklassering {final_position} ({veld})"
-                    flows.append((source, target, 1))
-                    node_counts[source] += 1
-                    node_counts[target] += 1
-    
-    
-    print(f"\nFound {len([n for n in node_counts if n.startswith('Veld')])} veld categories")
-    print(f"Found {len([n for n in node_counts if '_' in n and not n.startswith('Position')])} detailed halve finale nodes")
-    print(f"Found {len([n for n in node_counts if n.startswith('Finale')])} individual finales")
-    print(f"Found {len([n for n in node_counts if n.startswith('Position')])} final positions")
+                    finale_flows[(source, finale_node)] += 1
+                    position_flows[(finale_node, target)] += 1
+                    node_velds[source] = node_velds[target] = veld
+                    position_numbers[target] = final_position
+    
+    # Nodes of each column, in order of first appearance
+    veld_nodes = dict.fromkeys(source for source, _ in halve_flows)
+    halve_nodes = dict.fromkeys([target for _, target in halve_flows] + [source for source, _ in finale_flows])
+    finale_nodes = dict.fromkeys(target for _, target in finale_flows)
+    position_nodes = dict.fromkeys(target for _, target in position_flows)
+    
+    # The stages share no links, so their flows are simply stacked
+    flow_dict = {**halve_flows, **finale_flows, **position_flows}
+    
+    # Node counts follow from the aggregated flows: a node carries its inflow or its
+    # outflow, whichever is larger, as summing both would count interior nodes twice
+    inflow = defaultdict(int)
+    outflow = defaultdict(int)
+    for (source, target), value in flow_dict.items():
+        outflow[source] += value
+        inflow[target] += value
+    flow_nodes = dict.fromkeys(node for edge in flow_dict for node in edge)
+    node_counts = {node: max(inflow[node], outflow[node]) for node in flow_nodes}
+    
+    if verbose:
+        print(f"\nFound {len(veld_nodes)} veld categories")
+        print(f"Found {len(halve_nodes)} detailed halve finale nodes")
+        print(f"Found {len(finale_nodes)} individual finales")
+        print(f"Found {len(position_nodes)} final positions")
     
     # Step 2: Create ordered node lists for all four columns
     # Column 1: Veld categories (using detected order)
-    col1_nodes = [f"Veld {v}" for v in config['veld_order'] if f"Veld {v}" in node_counts]
+    veld_names = [f"Veld {v}" for v in config['veld_order']]
+    col1_nodes = [n for n in veld_names if n in veld_nodes]
     
     # Column 2: Detailed halve finale nodes (grouped by detected halve finale groups, then by veld)
     col2_nodes = []
@@ -399,26 +372,25 @@ def create_four_column_cumulative_sankey(all_race_data):
     group_nodes = {group: [] for group in config['halve_finale_groups']}
     other_nodes = []
     
-    for node in node_counts.keys():
-        if '_' in node and not node.startswith('Eindklassering') and not node.startswith('Veld'):
-            assigned = False
-            for group in config['halve_finale_groups']:
-                if node.startswith(f"{group}_"):
-                    group_nodes[group].append(node)
-                    assigned = True
-                    break
-            if not assigned:
-                other_nodes.append(node)
+    # Node id prefixes of the halve finale groups
+    group_prefixes = tuple(f"{group}_" for group in config['halve_finale_groups'])
+    
+    for node in halve_nodes:
+        assigned = False
+        for group, prefix in zip(config['halve_finale_groups'], group_prefixes):
+            if node.startswith(prefix):
+                group_nodes[group].append(node)
+                assigned = True
+                break
+        if not assigned:
+            other_nodes.append(node)
     
     # Sort within each group by veld category using detected order
+    veld_priority = {veld: i for i, veld in enumerate(config['veld_order'])}
     def sort_by_veld(node_list):
-        """Sort nodes by veld category according to detected order"""
-        def get_veld_priority(node):
-            for i, veld in enumerate(config['veld_order']):
-                if veld in node:
-                    return i
-            return 999  # Unknown veld goes to end
-        return sorted(node_list, key=get_veld_priority)
+        """Sort '<group>_<veld>' nodes by veld category according to detected order"""
+        # Unknown veld goes to end
+        return sorted(node_list, key=lambda node: veld_priority.get(node_velds[node], 999))
     
     # Combine all groups in order
     for group in sorted(config['halve_finale_groups']):
@@ -427,175 +399,89 @@ def create_four_column_cumulative_sankey(all_race_data):
     col2_nodes.extend(sort_by_veld(other_nodes))
     
     # Column 3: Individual finales (using detected finale letters)
-    finale_order = [f'Finale {letter}' for letter in sorted(config['finale_letters'])]
-    col3_nodes = [f for f in finale_order if f in node_counts]
+    col3_nodes = [finale_node for finale_node, _, _ in finale_meta.values() if finale_node in finale_nodes]
     
     # Column 4: Final positions (sorted by position number)
-    col4_nodes = []
-    position_nodes = [n for n in node_counts.keys() if n.startswith('Eindklassering')]
-    # Sort by position number
-    def get_position_number(node):
-        try:
-            return int(node.split('Eindklassering ')[1].split(' ')[0])
-        except:
-            return 999
-    col4_nodes = sorted(position_nodes, key=get_position_number)
-    
-    print(f"\nColumn 1 (Veld): {len(col1_nodes)} nodes")
-    print(f"Column 2 (Halve Finales): {len(col2_nodes)} nodes")
-    print(f"Column 3 (Finales): {len(col3_nodes)} nodes")
-    print(f"Column 4 (Eindklassering): {len(col4_nodes)} nodes")
+    col4_nodes = sorted(position_nodes, key=position_numbers.__getitem__)
+    
+    if verbose:
+        print(f"\nColumn 1 (Veld): {len(col1_nodes)} nodes")
+        print(f"Column 2 (Halve Finales): {len(col2_nodes)} nodes")
+        print(f"Column 3 (Finales): {len(col3_nodes)} nodes")
+        print(f"Column 4 (Eindklassering): {len(col4_nodes)} nodes")
     
     # Step 3: Calculate cumulative positions for all four columns
-    def calc_positions(nodes, counts, x_pos):
-        total = sum(counts[node] for node in nodes)
-        positions = {}
-        cumulative = 0
+    # y positions are returned as a list aligned with the column's nodes
+    def calc_positions(nodes, counts):
+        values = np.fromiter((counts[node] for node in nodes), dtype=np.float64, count=len(nodes))
         
-        for node in nodes:
-            value = counts[node]
-            y_center = (cumulative + value/2) / total
-            y_pos = max(0.001, min(0.999, y_center))
-            positions[node] = {'x': x_pos, 'y': y_pos}
-            cumulative += value
-            
-        return positions
-    
-    col1_positions = calc_positions(col1_nodes, node_counts, 0.02)  # Left column
-    col2_positions = calc_positions(col2_nodes, node_counts, 0.35)  # Second column
-    col3_positions = calc_positions(col3_nodes, node_counts, 0.65)  # Third column
-    col4_positions = calc_positions(col4_nodes, node_counts, 0.98)  # Right column
-    
-    all_positions = {**col1_positions, **col2_positions, **col3_positions, **col4_positions}
-    
-    # Show positioning (first few only to avoid too much output)
-    print("\nColumn 1 (Veld categorieën):")
-    for node in col1_nodes:
-        pos = col1_positions[node]
-        count = node_counts[node]
-        print(f"  {node:<20} y={pos['y']:.3f} (count: {count})")
-    
-    print(f"\nColumn 4 (Final Positions) - first 10:")
-    for node in col4_nodes[:10]:
-        pos = col4_positions[node]
-        count = node_counts[node]
-        position_num = get_position_number(node)
-        veld = node.split('(')[1].split(')')[0] if '(' in node else "Unknown"
-        print(f"  {node:<30} y={pos['y']:.3f} (pos: {position_num}) [{veld}]")
-    if len(col4_nodes) > 10:
-        print(f"  ... and {len(col4_nodes)-10} more positions")
+        # Each node is centered on its own share of the cumulative total,
+        # the last cumulative value is the column total
+        cumulative = np.cumsum(values)
+        total = cumulative[-1] if len(cumulative) else 1
+        y_centers = (cumulative - values / 2) / total
+        return np.clip(y_centers, 0.001, 0.999).tolist()
+    
+    col1_y = calc_positions(col1_nodes, node_counts)
+    col2_y = calc_positions(col2_nodes, node_counts)
+    col3_y = calc_positions(col3_nodes, node_counts)
+    col4_y = calc_positions(col4_nodes, node_counts)
+    
+    if verbose:
+        # Show positioning (first few only to avoid too much output)
+        print("\nColumn 1 (Veld categorieën):")
+        for node, y in zip(col1_nodes, col1_y):
+            count = node_counts[node]
+            print(f"  {node:<20} y={y:.3f} (count: {count})")
+    
+        print(f"\nColumn 4 (Final Positions) - first 10:")
+        for node, y in zip(col4_nodes[:10], col4_y):
+            position_num = position_numbers[node]
+            veld = node_velds[node]
+            print(f"  {node:<30} y={y:.3f} (pos: {position_num}) [{veld}]")
+        if len(col4_nodes) > 10:
+            print(f"  ... and {len(col4_nodes)-10} more positions")
     
     # Step 4: Create Sankey
     all_nodes = col1_nodes + col2_nodes + col3_nodes + col4_nodes
-    node_to_index = {node: i for i, node in enumerate(all_nodes)}
-    
-    # Node data
-    node_x = [all_positions[node]['x'] for node in all_nodes]
-    node_y = [all_positions[node]['y'] for node in all_nodes]
-    
-    # Create labels array - empty strings for halve finale nodes
-    node_labels = []
-    for node in all_nodes:
-        # Check if this is a halve finale node (any group prefix followed by underscore)
-        is_halve_finale = False
-        for group in config['halve_finale_groups']:
-            if node.startswith(f'{group}_'):
-                is_halve_finale = True
-                break
-        
-        if is_halve_finale:
-            node_labels.append("")  # No label for halve finale nodes
-        else:
-            node_labels.append(node)  # Regular label for other nodes
-    
-    # Enhanced adaptive color scheme
-    node_colors = []
-    
-    for node in all_nodes:
-        # Helper to get veld from node string with precise matching
-        def extract_veld(node_str):
-            # Sort by length descending to match longer strings first (e.g., LMG-B 4- before MG-B 4-)
-            sorted_velds = sorted(config['veld_order'], key=len, reverse=True)
-            for veld in sorted_velds:
-                # Use more precise matching - check if the veld appears as a complete word
-                if f" {veld}" in node_str or node_str.endswith(veld) or f"({veld})" in node_str:
-                    return veld
-            return None
-        
-        if node.startswith('Veld'):
-            # Color veld category nodes with their detected colors
-            veld = extract_veld(node)
-            node_colors.append(veld_colors.get(veld, '#95A5A6'))
-        elif any(node.startswith(f'{group}_') for group in config['halve_finale_groups']):
-            # Color halve finale nodes based on their field category (same colors as veld categories)
-            veld = extract_veld(node)
-            node_colors.append(veld_colors.get(veld, '#95A5A6'))
-        elif node.startswith('Finale'):
-            node_colors.append('#95A5A6')  # Gray for finale nodes (mixed inflows/outflows)
-        elif node.startswith('Eindklassering'):
-            # Color position nodes with the same colors as their corresponding veld categories
-            veld = extract_veld(node)
-            node_colors.append(veld_colors.get(veld, '#95A5A6'))
-        else:
-            node_colors.append('#95A5A6')  # Gray for others
     
+    # Node indices per column, offset by the sizes of the columns before it
+    col_index = []
+    offset = 0
+    for nodes in (col1_nodes, col2_nodes, col3_nodes, col4_nodes):
+        col_index.append({node: offset + i for i, node in enumerate(nodes)})
+        offset += len(nodes)
     
-    # Create adaptive color mapping for links
-    veld_link_colors = {}
-    for veld, color_hex in veld_colors.items():
-        # Convert hex to rgba
-        rgb = tuple(int(color_hex[i:i+2], 16) for i in (1, 3, 5))
-        rgba = f'rgba({rgb[0]}, {rgb[1]}, {rgb[2]}, 0.6)'
-        veld_link_colors[f'Veld {veld}'] = rgba
+    # Node data, column by column in the same order as all_nodes - x is constant per column
+    node_x = ([0.02] * len(col1_nodes)     # Left column
+              + [0.35] * len(col2_nodes)   # Second column
+              + [0.65] * len(col3_nodes)   # Third column
+              + [0.98] * len(col4_nodes))  # Right column
+    node_y = col1_y + col2_y + col3_y + col4_y
     
-    # Use the same colors for halve finale nodes 
-    halve_finale_colors = {}
-    for veld in config['veld_order']:
-        rgba_color = veld_link_colors.get(f'Veld {veld}', 'rgba(128,128,128,0.4)')
-        # Add colors for all halve finale group combinations
-        for group in config['halve_finale_groups']:
-            halve_finale_colors[f'{group}_{veld}'] = rgba_color
+    # Create labels array - empty strings for halve finale nodes
+    # No label for halve finale nodes (any group prefix followed by underscore), regular label for other nodes
+    node_labels = ["" if node.startswith(group_prefixes) else node for node in all_nodes]
     
-    # Combine all link colors
-    all_link_colors = {**veld_link_colors, **halve_finale_colors}
+    # Enhanced adaptive color scheme - veld, halve finale and position nodes share
+    # the colors of their veld category, finale nodes and others are gray
+    node_colors = [veld_colors.get(node_velds.get(node), '#95A5A6') for node in all_nodes]
     
     # Links with enhanced colors
-    flow_dict = defaultdict(int)
-    for source, target, value in flows:
-        if source in node_to_index and target in node_to_index:
-            flow_dict[(source, target)] += value
-    
-    link_sources = [node_to_index[s] for s, t in flow_dict.keys()]
-    link_targets = [node_to_index[t] for s, t in flow_dict.keys()]
-    link_values = list(flow_dict.values())
-    
-    # Color links based on source and target
-    link_colors_final = []
-    for source, target in flow_dict.keys():
-        if source in all_link_colors:
-            # Use source-based coloring for veld and halve finale flows
-            link_colors_final.append(all_link_colors[source])
-        elif source.startswith('Finale') and target.startswith('Eindklassering'):
-            # For finale-to-position flows, use the field color from the target position adaptively
-            # Sort by length descending to match longer strings first (e.g., LMG-B 4- before MG-B 4-)
-            target_veld = None
-            sorted_velds = sorted(config['veld_order'], key=len, reverse=True)
-            for veld in sorted_velds:
-                # Use more precise matching - check if the veld appears as a complete word
-                if f" {veld}" in target or target.endswith(veld) or f"({veld})" in target:
-                    target_veld = veld
-                    break
-            
-            if target_veld and target_veld in veld_colors:
-                # Convert hex to rgba for the target veld
-                color_hex = veld_colors[target_veld]
-                rgb = tuple(int(color_hex[i:i+2], 16) for i in (1, 3, 5))
-                rgba = f'rgba({rgb[0]}, {rgb[1]}, {rgb[2]}, 0.6)'
-                link_colors_final.append(rgba)
-            else:
-                link_colors_final.append('rgba(128,128,128,0.4)')  # Default gray
-        else:
-            link_colors_final.append('rgba(128,128,128,0.4)')  # Default gray
+    # Each stage links a column to the next one, so its nodes are only looked up in those two
+    # columns; the stages are stacked in the same order as the links in flow_dict
+    stage_flows = (halve_flows, finale_flows, position_flows)
+    link_sources = np.fromiter((col_index[i][source] for i, stage in enumerate(stage_flows) for source, _ in stage),
+                               dtype=np.int32, count=len(flow_dict))
+    link_targets = np.fromiter((col_index[i + 1][target] for i, stage in enumerate(stage_flows) for _, target in stage),
+                               dtype=np.int32, count=len(flow_dict))
+    link_values = np.fromiter(flow_dict.values(), dtype=np.int32, count=len(flow_dict))
+    
+    # Color links based on source and target: finale-to-position flows use the field color
+    # from the target position, veld and halve finale flows use source-based coloring
+    link_colors_final = [veld_link_colors.get(node_velds.get(target if source.startswith('Finale') else source),
+                                              'rgba(128,128,128,0.4)')  # Default gray
+                         for source, target in flow_dict]
     
     # Create figure
     fig = go.Figure(data=[go.Sankey(
@@ -629,5 +515,3 @@ def create_four_column_cumulative_sankey(all_race_data):
     )
     
     return fig
-
-# Test the 4-column version
\ No newline at end of file